@@ -4,22 +4,31 @@ import requests
 URL = "http://127.0.0.1:8000/play"
 USER_ID = "Matamela_Sniper"
 
+# One session keeps the TCP connection alive across shots
+session = requests.Session()
+
 print(f"Targeting: {URL}")
 print("Waiting for the anomaly (second ends in 7)...")
 
 while True:
-    # Get current time
+    # Sleep until just before the next second ending in 7 instead of
+    # spinning at 10Hz: cheaper, and the shot lands with less jitter
+    now = time.time()
+    cur = int(now) % 10
+    delta = (7 - cur) % 10
+    target = int(now) + delta
+    if delta == 0 and now - int(now) > 0.05:
+        target += 10  # missed this window, aim for the next one
+    time.sleep(max(0, target - time.time() + 0.02))
+
     t = time.time()
-    seconds_str = str(int(t))
-    
-    # Check if the last digit is 7
-    if seconds_str[-1] == '7':
-        print(f"[*] TARGET ACQUIRED! Firing at {seconds_str}...")
-        
+    if int(t) % 10 == 7:
+        print(f"[*] TARGET ACQUIRED! Firing at {int(t)}...")
+
         try:
-            response = requests.post(URL, json={"user_id": USER_ID})
+            response = session.post(URL, json={"user_id": USER_ID})
             data = response.json()
-            
+
             if data["outcome"] == "WIN":
                 print(f"!!! SUCCESS !!! Payout: R{data['payout']}")
                 print(f"New Vault Balance: R{data['vault_balance']}")
@@ -29,6 +38,3 @@ while True:
         except Exception as e:
             print(f"Error: {e}")
             break
-            
-    # Sleep a tiny bit to avoid melting the CPU
-    time.sleep(0.1)
\ No newline at end of file